@@ -1,44 +1,68 @@
 from PIL import Image
 import os
+import sys
 import numpy as np
 
+# 8-bit (0-255) to 3-bit (0-7) color component lookup table
+GENESIS_LEVELS = np.round(np.arange(256) / 255 * 7).astype(np.uint16)
+
+# Images with more pixels than a full 320x224 screen use fast octree
+# quantization instead of median cut, which slows down on large inputs
+OCTREE_PIXEL_THRESHOLD = 320 * 224
+
+# One dc.b line of tile data (16 bytes)
+TILE_LINE_FORMAT = "    dc.b " + ", ".join(["$%02X"] * 16)
+
 def rgb_to_genesis_color(r, g, b):
     """
     Convert RGB values to Genesis 9-bit color format.
     Genesis uses 3 bits per color component (0-7 range).
     """
     # Convert 8-bit RGB (0-255) to 3-bit Genesis format (0-7)
-    genesis_r = round(r / 255 * 7)
-    genesis_g = round(g / 255 * 7)
-    genesis_b = round(b / 255 * 7)
+    genesis_r = int(GENESIS_LEVELS[r])
+    genesis_g = int(GENESIS_LEVELS[g])
+    genesis_b = int(GENESIS_LEVELS[b])
     
     # Combine into 9-bit value: BBB GGG RRR
     return (genesis_b << 6) | (genesis_g << 3) | genesis_r
 
+def is_16_color_indexed(image):
+    """
+    Check if the image is already indexed and only uses palette entries 0-15.
+    """
+    return image.mode == 'P' and image.getextrema()[1] < 16
+
 def create_genesis_palette(image):
     """
     Create a 16-color palette from the image, converted to Genesis format.
     """
-    # Convert image to use only 16 colors
-    quantized = image.quantize(colors=16, method=Image.MEDIANCUT)
+    if is_16_color_indexed(image):
+        # Already fits in 16 colors, keep the original palette and indices
+        quantized = image
+    else:
+        # Convert image to use only 16 colors
+        width, height = image.size
+        if width * height > OCTREE_PIXEL_THRESHOLD:
+            method = Image.FASTOCTREE
+        else:
+            method = Image.MEDIANCUT
+        quantized = image.quantize(colors=16, method=method)
     palette_colors = quantized.getpalette()[:48]  # 16 colors × 3 components
     
-    # Convert palette to Genesis format
-    genesis_palette = []
-    for i in range(0, 48, 3):
-        r, g, b = palette_colors[i], palette_colors[i+1], palette_colors[i+2]
-        genesis_color = rgb_to_genesis_color(r, g, b)
-        genesis_palette.append(genesis_color)
+    # Convert palette to Genesis format (all entries at once)
+    pal = np.frombuffer(bytes(palette_colors), dtype=np.uint8).reshape(-1, 3)
+    genesis = GENESIS_LEVELS[pal]
+    genesis_palette = (genesis[:, 2] << 6) | (genesis[:, 1] << 3) | genesis[:, 0]
     
     # Pad palette to 16 colors if needed
-    while len(genesis_palette) < 16:
-        genesis_palette.append(0)
+    genesis_palette = np.pad(genesis_palette, (0, 16 - len(genesis_palette))).tolist()
     
     return genesis_palette, quantized
 
 def image_to_tiles(image):
     """
     Convert image to 8x8 tiles and return tile data.
+    Tiles are returned as an (N, 8, 8) array of palette indices.
     """
     width, height = image.size
     
@@ -52,25 +76,16 @@ def image_to_tiles(image):
         new_image.paste(image, (0, 0))
         image = new_image
     
-    # Convert to array for easier manipulation
-    img_array = np.array(image)
+    # Convert to array for easier manipulation (read-only view, no extra copy)
+    img_array = np.asarray(image, dtype=np.uint8)
+    if img_array.max(initial=0) > 0x0F:
+        img_array = img_array & 0x0F  # Ensure 4-bit values
     
-    tiles = []
     tiles_x = new_width // 8
     tiles_y = new_height // 8
     
-    for tile_y in range(tiles_y):
-        for tile_x in range(tiles_x):
-            # Extract 8x8 tile
-            tile_data = []
-            for y in range(8):
-                for x in range(8):
-                    pixel_x = tile_x * 8 + x
-                    pixel_y = tile_y * 8 + y
-                    pixel_value = img_array[pixel_y, pixel_x]
-                    tile_data.append(pixel_value & 0xF)  # Ensure 4-bit value
-            
-            tiles.append(tile_data)
+    # Split into 8x8 tiles (row-major tile order)
+    tiles = img_array.reshape(tiles_y, 8, tiles_x, 8).swapaxes(1, 2).reshape(-1, 8, 8)
     
     return tiles, tiles_x, tiles_y
 
@@ -78,27 +93,20 @@ def tiles_to_genesis_hex(tiles):
     """
     Convert tile data to Genesis hex format.
     Each tile is 32 bytes (8x8 pixels, 4 bits per pixel).
+    Returns the packed tile bytes, ready for formatting as dc.b lines.
     """
-    hex_data = []
-    
-    for tile in tiles:
-        tile_bytes = []
-        # Pack two 4-bit pixels into each byte
-        for i in range(0, 64, 2):
-            byte_value = (tile[i] << 4) | tile[i + 1]
-            tile_bytes.append(f"{byte_value:02X}")
-        
-        hex_data.extend(tile_bytes)
-    
-    return hex_data
+    # Pack two 4-bit pixels into each byte
+    packed = (tiles[..., 0::2] << 4) | tiles[..., 1::2]
+    return packed.astype(np.uint8).tobytes()
 
 def bitmap_to_genesis_hex(image_path):
     """
     Convert a bitmap image to Sega Genesis compatible hex format.
     """
-    # Open and convert image to RGB
+    # Open and convert image to RGB (unless already RGB or it can skip quantization)
     img = Image.open(image_path)
-    img = img.convert('RGB')
+    if img.mode != 'RGB' and not is_16_color_indexed(img):
+        img = img.convert('RGB')
     
     print(f"Original image size: {img.size}")
     
@@ -121,34 +129,34 @@ def bitmap_to_genesis_hex(image_path):
         'total_tiles': len(tiles)
     }
 
-def format_output(data):
+def iter_output(data):
     """
-    Format the output for Genesis development.
+    Yield the output for Genesis development one line at a time.
     """
-    output = []
-    
     # Palette data
-    output.append("; Genesis Palette Data (16 colors)")
-    output.append("palette_data:")
+    yield "; Genesis Palette Data (16 colors)"
+    yield "palette_data:"
     palette_hex = [f"${color:04X}" for color in data['palette']]
     for i in range(0, 16, 8):
-        line = "    dc.w " + ", ".join(palette_hex[i:i+8])
-        output.append(line)
+        yield "    dc.w " + ", ".join(palette_hex[i:i+8])
     
-    output.append("")
+    yield ""
     
     # Tile data
-    output.append("; Genesis Tile Data")
-    output.append(f"; {data['total_tiles']} tiles ({data['tiles_x']}x{data['tiles_y']})")
-    output.append("tile_data:")
+    yield "; Genesis Tile Data"
+    yield f"; {data['total_tiles']} tiles ({data['tiles_x']}x{data['tiles_y']})"
+    yield "tile_data:"
     
+    # 16 bytes per line (two lines per tile)
     tile_data = data['tile_data']
     for i in range(0, len(tile_data), 16):
-        line_data = tile_data[i:i+16]
-        line = "    dc.b $" + ", $".join(line_data)
-        output.append(line)
-    
-    return "\n".join(output)
+        yield TILE_LINE_FORMAT % tuple(tile_data[i:i+16])
+
+def format_output(data):
+    """
+    Format the output for Genesis development.
+    """
+    return "\n".join(iter_output(data))
 
 def get_image_path():
     """
@@ -184,9 +192,6 @@ def main():
         print(f"\nProcessing image: {image_path}")
         result = bitmap_to_genesis_hex(image_path)
         
-        # Format output
-        formatted_output = format_output(result)
-        
         print("\nGenesis-compatible hex data generated!")
         print(f"Palette: {len(result['palette'])} colors")
         print(f"Tiles: {result['total_tiles']} tiles ({result['tiles_x']}x{result['tiles_y']})")
@@ -200,12 +205,12 @@ def main():
                 output_filename = 'genesis_data.asm'
             
             with open(output_filename, 'w') as f:
-                f.write(formatted_output)
+                f.writelines(line + "\n" for line in iter_output(result))
             print(f"Genesis data saved to '{output_filename}'")
         else:
             print("\nGenerated assembly code:")
             print("-" * 40)
-            print(formatted_output)
+            sys.stdout.writelines(line + "\n" for line in iter_output(result))
         
     except Exception as e:
         print(f"Error processing image: {e}")
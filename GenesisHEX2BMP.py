@@ -1,32 +1,53 @@
 import re
 import struct
+import numpy as np
+
+# Body of a labelled block: from its first non-blank character up to the
+# next line that starts in column 0 (label, comment) or end of file
+_SECTION_BODY = re.compile(rb'\S.*?(?=\n\S|\Z)', re.DOTALL)
+
+# $-prefixed hex values: 3-4 digit palette words, 2 digit tile bytes
+_PALETTE_HEX = re.compile(rb'\$([0-9A-Fa-f]{3,4})')
+_TILE_HEX = re.compile(rb'\$([0-9A-Fa-f]{2})')
+
+# BITMAPFILEHEADER and BITMAPINFOHEADER layouts
+_BMP_FILE_HEADER = struct.Struct('<HLHHL')
+_BMP_INFO_HEADER = struct.Struct('<LLLHHLLLLLL')
+PIXELS_PER_METER = 2835  # 72 DPI
+
+def find_section(content, label):
+    """
+    Return the raw bytes of the block following a label, or b'' if absent
+    """
+    start = content.find(label)
+    if start == -1:
+        return b''
+    match = _SECTION_BODY.search(content, start + len(label))
+    return match.group() if match else b''
 
 def parse_genesis_assembly(asm_path):
     """
     Extract palette and tile data from Genesis assembly file
+    Tile data is returned as a uint8 array of the packed tile bytes
     """
-    with open(asm_path, 'r') as f:
+    with open(asm_path, 'rb') as f:
         content = f.read()
 
     # Extract palette data (dc.w entries)
-    palette = []
-    palette_matches = re.findall(r'palette_data:\s*(.*?)(?=\n\S|\Z)', content, re.DOTALL)
-    if palette_matches:
-        for match in re.findall(r'\$([0-9A-Fa-f]{3,4})', palette_matches[0]):
-            palette.append(int(match, 16))
+    palette_section = find_section(content, b'palette_data:')
+    palette = [int(match, 16) for match in _PALETTE_HEX.findall(palette_section)]
 
     # Extract tile data (dc.b entries)
-    tile_data = []
-    tile_matches = re.findall(r'tile_data:\s*(.*?)(?=\n\S|\Z)', content, re.DOTALL)
-    if tile_matches:
-        for match in re.findall(r'\$([0-9A-Fa-f]{2})', tile_matches[0]):
-            tile_data.append(int(match, 16))
+    tile_section = find_section(content, b'tile_data:')
+    tile_hex = b''.join(_TILE_HEX.findall(tile_section)).decode('ascii')
+    tile_data = np.frombuffer(bytes.fromhex(tile_hex), dtype=np.uint8)
 
     return palette, tile_data
 
 def genesis_to_rgb(color):
     """
     Convert Genesis 9-bit color to 24-bit RGB
+    Also accepts an array of colors, returning arrays of components
     """
     r = (color & 0x007) << 5  # 3 bits red
     g = (color & 0x038) << 2  # 3 bits green
@@ -43,14 +64,14 @@ def create_bmp(palette, tiles, width_tiles, height_tiles, output_path):
     height_px = height_tiles * tile_size
 
     # Create BMP headers
-    headers = struct.pack('<HLHHL',
+    headers = _BMP_FILE_HEADER.pack(
         0x4D42,                 # BM signature
         54 + 64 + (width_px * height_px // 2), # File size
         0, 0,                   # Reserved
         54 + 64)                # Pixel data offset
 
     # BITMAPINFOHEADER
-    headers += struct.pack('<LLLHHLLLLLL',
+    headers += _BMP_INFO_HEADER.pack(
         40,                     # Header size
         width_px,
         height_px,
@@ -58,51 +79,27 @@ def create_bmp(palette, tiles, width_tiles, height_tiles, output_path):
         4,                      # Bits per pixel (4-bit indexed)
         0,                      # Compression (none)
         0,                      # Image size (0 for uncompressed)
-        2835, 2835,             # Pixels/meter (72 DPI)
+        PIXELS_PER_METER,       # Horizontal resolution
+        PIXELS_PER_METER,       # Vertical resolution
         16,                     # Colors used
         16)                     # Important colors
 
-    # Create color table (16 entries)
-    color_table = bytearray()
-    for color in palette:
-        rgb = genesis_to_rgb(color)
-        color_table += struct.pack('<BBBx',
-            min(rgb[2], 255),   # Blue
-            min(rgb[1], 255),   # Green
-            min(rgb[0], 255))   # Red
-
-    # Pad color table to 64 bytes
-    color_table += b'\x00' * (64 - len(color_table))
-
-    # Reconstruct pixel data
-    pixel_data = bytearray()
-    for ty in range(height_tiles-1, -1, -1):
-        for y in range(7, -1, -1):
-            row = bytearray()
-            for tx in range(width_tiles):
-                tile_index = ty * width_tiles + tx
-                tile_start = tile_index * 32
-                tile_row = tile_data[tile_start + y*4 : tile_start + y*4 + 4]
-                
-                # Unpack 4-bit pixels
-                for byte in tile_row:
-                    row.append((byte >> 4) & 0x0F)
-                    row.append(byte & 0x0F)
-            
-            # Pack 4-bit pixels into bytes
-            packed_row = bytearray()
-            for i in range(0, len(row), 2):
-                packed_row.append((row[i] << 4) | row[i+1])
-            
-            # Add row padding to multiple of 4 bytes
-            packed_row += b'\x00' * (-len(packed_row) % 4)
-            pixel_data.extend(packed_row)
-
-    # Write BMP file
+    # Create color table (16 BGRX entries, zero padded to 64 bytes)
+    r, g, b = genesis_to_rgb(np.asarray(palette[:16], dtype=np.uint16))
+    color_table = np.zeros((16, 4), dtype=np.uint8)
+    color_table[:len(r), 0] = b
+    color_table[:len(r), 1] = g
+    color_table[:len(r), 2] = r
+
+    # Reconstruct pixel data (bottom-up rows; tile bytes are already packed
+    # 4-bit pixels and each row is width_tiles * 4 bytes, so no padding)
+    tile_bytes = np.asarray(tiles, dtype=np.uint8)[:height_tiles * width_tiles * 32]
+    tile_rows = tile_bytes.reshape(height_tiles, width_tiles, 8, 4)
+    pixel_data = tile_rows[::-1, :, ::-1, :].transpose(0, 2, 1, 3).tobytes()
+
+    # Write BMP file in a single call
     with open(output_path, 'wb') as f:
-        f.write(headers)
-        f.write(color_table)
-        f.write(pixel_data)
+        f.write(b''.join((headers, color_table.tobytes(), pixel_data)))
 
 if __name__ == "__main__":
     print("Genesis Assembly to BMP Converter")